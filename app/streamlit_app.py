@@ -1,12 +1,17 @@
 import os
 import io
+import shutil
+import hashlib
 import streamlit as st
 
 from src.config import (
     OLLAMA_BASE_URL, OLLAMA_TIMEOUT, OLLAMA_KEEP_ALIVE,
-    OLLAMA_CHAT_MODEL, OLLAMA_CODE_MODEL, DATA_DIR, LLAMA_CLOUD_API_KEY
+    OLLAMA_CHAT_MODEL, OLLAMA_CODE_MODEL, DATA_DIR, LLAMA_CLOUD_API_KEY, EMBED_BATCH_SIZE,
+    OLLAMA_CHAT_NUM_PREDICT, OLLAMA_CHAT_NUM_CTX, OLLAMA_CODE_NUM_PREDICT, OLLAMA_CODE_NUM_CTX,
+    OLLAMA_EAGER_WARMUP,
 )
 from src.agents.ai_code_agent import AICodeAgent
+from src.services.rag import EMBED_MODEL_NAME, embed_device, get_embed_model, has_documents
 
 import sys
 from pathlib import Path
@@ -20,8 +25,23 @@ st.set_page_config(page_title="AI Code Agent", layout="wide")
 
 # -------------- Helpers --------------
 def ensure_dirs():
-    os.makedirs("data", exist_ok=True)
-    os.makedirs("output", exist_ok=True)
+    Path("data").mkdir(parents=True, exist_ok=True)
+    Path("output").mkdir(parents=True, exist_ok=True)
+
+def same_content(path: str, uf) -> bool:
+    """True if `path` already holds exactly the uploaded bytes (size check first, then sha256)."""
+    if not os.path.isfile(path) or os.path.getsize(path) != uf.size:
+        return False
+    on_disk = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            on_disk.update(chunk)
+    return on_disk.hexdigest() == hashlib.sha256(uf.getbuffer()).hexdigest()
+
+@st.cache_resource(show_spinner=True)
+def embed_model_cached(name: str, batch: int):
+    # Cached separately from the agent so "Rebuild Agent" doesn't reload the embedder
+    return get_embed_model(name, embed_device(), batch)
 
 @st.cache_resource(show_spinner=True)
 def build_agent_cached():
@@ -33,6 +53,14 @@ def build_agent_cached():
         code_model=OLLAMA_CODE_MODEL,
         data_dir=DATA_DIR,
         llama_cloud_api_key=LLAMA_CLOUD_API_KEY,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        chat_num_predict=OLLAMA_CHAT_NUM_PREDICT,
+        chat_num_ctx=OLLAMA_CHAT_NUM_CTX,
+        code_num_predict=OLLAMA_CODE_NUM_PREDICT,
+        code_num_ctx=OLLAMA_CODE_NUM_CTX,
+        eager_warmup=OLLAMA_EAGER_WARMUP,
+        # Only load the embedder when there is something to index
+        embed_model=embed_model_cached(EMBED_MODEL_NAME, EMBED_BATCH_SIZE) if has_documents(DATA_DIR) else None,
     )
 
 # -------------- Sidebar --------------
@@ -50,7 +78,7 @@ with st.sidebar.expander("Environment / Models", expanded=True):
         st.warning("LlamaParse: Disabled (fallback reader)")
 
 if st.sidebar.button("Rebuild Agent"):
-    st.cache_resource.clear()
+    build_agent_cached.clear()
     st.rerun()
 
 # -------------- Main Layout --------------
@@ -60,17 +88,36 @@ st.write("Read docs & code, reason, and generate scripts locally — **no extern
 ensure_dirs()
 agent = build_agent_cached()
 
+if st.sidebar.button("Clear Response Cache"):
+    agent.clear_cache()
+    st.sidebar.success("Cached responses cleared.")
+
 # Upload area
 st.subheader("📥 Upload Files to `/data`")
 uploaded_files = st.file_uploader(
     "Upload PDFs or code files (they will be saved into the `data/` folder)", type=None, accept_multiple_files=True
 )
 if uploaded_files:
+    # file_uploader returns the same files on every rerun; only write new or changed ones
+    # so their mtimes (which key the index and LlamaParse caches) stay put
+    saved_ids = st.session_state.setdefault("saved_upload_ids", set())
+    written = 0
     for uf in uploaded_files:
+        if uf.file_id in saved_ids:
+            continue
         path = os.path.join("data", uf.name)
-        with open(path, "wb") as f:
-            f.write(uf.getbuffer())
-    st.success(f"Saved {len(uploaded_files)} file(s) to `data/`. You may click 'Rebuild Agent' if you added new PDFs.")
+        if not same_content(path, uf):
+            # Hidden temp name: a leftover from a crash is skipped by the reader and has_documents
+            tmp_path = os.path.join("data", f".{uf.name}.part")
+            # Stream in 1 MiB chunks and swap in atomically so a crash never leaves a half-written file
+            uf.seek(0)
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(uf, f, length=1 << 20)
+            os.replace(tmp_path, path)
+            written += 1
+        saved_ids.add(uf.file_id)
+    if written:
+        st.success(f"Saved {written} file(s) to `data/`. You may click 'Rebuild Agent' if you added new PDFs, or 'Clear Response Cache' to re-run earlier prompts.")
 
 st.divider()
 
@@ -86,10 +133,13 @@ with col2:
 
 # Results
 if run_plain and prompt.strip():
-    with st.spinner("Thinking..."):
-        text = agent.query_text(prompt.strip())
     st.markdown("**Agent Response (raw text):**")
-    st.code(text)
+    container = st.empty()
+    buf = []
+    with st.spinner("Thinking..."):
+        for tok in agent.stream_text(prompt.strip()):
+            buf.append(tok)
+            container.code("".join(buf))
 
 if run_structured and prompt.strip():
     with st.spinner("Generating structured code..."):
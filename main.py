@@ -20,7 +20,9 @@ if PROJECT_ROOT not in sys.path:
 
 from src.config import (
     OLLAMA_BASE_URL, OLLAMA_TIMEOUT, OLLAMA_KEEP_ALIVE,
-    OLLAMA_CHAT_MODEL, OLLAMA_CODE_MODEL, DATA_DIR, LLAMA_CLOUD_API_KEY
+    OLLAMA_CHAT_MODEL, OLLAMA_CODE_MODEL, DATA_DIR, LLAMA_CLOUD_API_KEY, EMBED_BATCH_SIZE,
+    OLLAMA_CHAT_NUM_PREDICT, OLLAMA_CHAT_NUM_CTX, OLLAMA_CODE_NUM_PREDICT, OLLAMA_CODE_NUM_CTX,
+    OLLAMA_EAGER_WARMUP,
 )
 from src.agents.ai_code_agent import AICodeAgent
 
@@ -41,6 +43,12 @@ def build_agent() -> AICodeAgent:
         code_model=OLLAMA_CODE_MODEL,
         data_dir=DATA_DIR,
         llama_cloud_api_key=LLAMA_CLOUD_API_KEY,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        chat_num_predict=OLLAMA_CHAT_NUM_PREDICT,
+        chat_num_ctx=OLLAMA_CHAT_NUM_CTX,
+        code_num_predict=OLLAMA_CODE_NUM_PREDICT,
+        code_num_ctx=OLLAMA_CODE_NUM_CTX,
+        eager_warmup=OLLAMA_EAGER_WARMUP,
     )
 
 
@@ -1,18 +1,45 @@
 import os
-from typing import Optional
+import string
+import unicodedata
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional
 
 from llama_index.llms.ollama import Ollama
 from llama_index.core.tools import QueryEngineTool, ToolMetadata
 from llama_index.core.agent import ReActAgent
 
-from src.services.ollama_utils import check_ollama_health, model_in_tags, warmup_ollama
-from src.services.rag import build_query_engine
+from src.services.ollama_utils_async import (
+    async_client, fetch_tag_names, warmup_ollama_async, run_sync
+)
+from src.services.rag import build_query_engine, EmptyQueryEngine
 from src.services.structuring import (
-    build_output_pipeline, extract_text, robust_parse_to_dict, fallback_extract_code, CodeOutput
+    build_json_prompt, extract_text, robust_parse_to_dict, fallback_extract_code, CodeOutput,
+    PYTHON_FENCE_LANGS,
 )
 from src.tools.code_reader import code_reader
 from src.prompts import context
 
+QUERY_CACHE_SIZE = 128
+
+# Allowlist over ASCII: [a-z0-9_-] kept, whitespace/path separators become "_", everything else
+# (punctuation, control chars, NUL) is dropped. Applied after folding the text to ASCII.
+_FN_OK = set(string.ascii_lowercase + string.digits + "_-")
+_FN_SEP = set(string.whitespace + "./\\")
+_FN_TABLE = str.maketrans(
+    {chr(i): (chr(i) if chr(i) in _FN_OK else "_" if chr(i) in _FN_SEP else None) for i in range(128)}
+)
+
+def _slug(s: str, ext: str = ".py") -> str:
+    """Filesystem-safe filename derived from free text (LLM-suggested name or the prompt)."""
+    base, e = os.path.splitext(s.strip())
+    if e.lower() == ext:
+        s = base
+    s = unicodedata.normalize("NFKD", s.lower()).encode("ascii", "ignore").decode().translate(_FN_TABLE)
+    s = "_".join(filter(None, s.split("_")))[:40].strip("_-")
+    return (s or "generated") + ext
+
 class AICodeAgent:
     """Wraps LLMs, RAG engine, tools, and JSON structuring in one interface."""
 
@@ -25,6 +52,13 @@ class AICodeAgent:
         code_model: str,
         data_dir: str,
         llama_cloud_api_key: Optional[str] = None,
+        embed_batch_size: int = 64,
+        embed_model=None,
+        chat_num_predict: int = 512,
+        chat_num_ctx: int = 4096,
+        code_num_predict: int = 1024,
+        code_num_ctx: int = 8192,
+        eager_warmup: bool = False,
     ):
         self.base_url = base_url
         self.timeout = timeout
@@ -33,25 +67,34 @@ class AICodeAgent:
         self.code_model = code_model
         self.data_dir = data_dir
         self.llama_cloud_api_key = llama_cloud_api_key
-
-        if not check_ollama_health(self.base_url):
-            raise RuntimeError(f"Ollama at {self.base_url} is not reachable.")
-
-        # Helpful warnings
-        for m in (self.chat_model, self.code_model):
-            if not model_in_tags(self.base_url, m):
-                print(f"[warn] Model '{m}' not in tags. Run 'ollama pull {m}'.")
-
-        # Warmups (non-fatal)
-        warmup_ollama(self.base_url, self.chat_model, keep_alive)
-        warmup_ollama(self.base_url, self.code_model, keep_alive)
-
-        # Build LLMs (no temperature)
-        self.chat_llm = Ollama(model=self.chat_model, base_url=self.base_url, request_timeout=self.timeout)
-        self.code_llm = Ollama(model=self.code_model, base_url=self.base_url, request_timeout=self.timeout)
+        self.embed_batch_size = embed_batch_size
+        self.embed_model = embed_model
+        self.chat_num_predict = chat_num_predict
+        self.chat_num_ctx = chat_num_ctx
+        self.code_num_predict = code_num_predict
+        self.code_num_ctx = code_num_ctx
+        self.eager_warmup = eager_warmup
+
+        # Health check, tag warnings and warmups over one async client
+        run_sync(self._bootstrap)
+
+        # Build LLMs with capped generation length; context_window is sent to Ollama as num_ctx
+        self.chat_llm = Ollama(
+            model=self.chat_model, base_url=self.base_url, request_timeout=self.timeout,
+            context_window=self.chat_num_ctx,
+            additional_kwargs={"num_predict": self.chat_num_predict},
+        )
+        self.code_llm = Ollama(
+            model=self.code_model, base_url=self.base_url, request_timeout=self.timeout,
+            context_window=self.code_num_ctx, temperature=0.1,
+            additional_kwargs={"num_predict": self.code_num_predict, "top_p": 0.9},
+        )
 
         # RAG over code model for better code faithfulness
-        rag_engine = build_query_engine(self.code_llm, self.data_dir, self.llama_cloud_api_key)
+        rag_engine = build_query_engine(
+            self.code_llm, self.data_dir, self.llama_cloud_api_key,
+            embed_batch_size=self.embed_batch_size, embed_model=self.embed_model,
+        )
 
         # Tools
         self.tools = [
@@ -59,7 +102,11 @@ class AICodeAgent:
                 query_engine=rag_engine,
                 metadata=ToolMetadata(
                     name="api_documentation",
-                    description="Reads and retrieves information from parsed API documentation."
+                    description=(
+                        "Reads and retrieves information from parsed API documentation."
+                        if not isinstance(rag_engine, EmptyQueryEngine)
+                        else "Reads parsed API documentation (no docs indexed yet — upload via sidebar)."
+                    ),
                 ),
             ),
             code_reader,
@@ -78,45 +125,127 @@ class AICodeAgent:
             self.tools, llm=self.code_llm, verbose=True, max_iterations=5, context=concise_context
         )
 
-        # Structuring pipeline (Pydantic JSON → CodeOutput)
-        self.pipeline = build_output_pipeline(self.code_llm)
+        # Structuring prompt (Pydantic JSON → CodeOutput), sent straight to the code LLM
+        self._json_prompt = build_json_prompt()
+
+        # LRU of prompt → plain-text response, shared by query_text and stream_text
+        # (Streamlit shares one agent across session threads, hence the lock)
+        self._text_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._text_cache_lock = threading.Lock()
 
         os.makedirs("output", exist_ok=True)
 
+    async def _bootstrap(self) -> None:
+        async with async_client(self.base_url) as client:
+            # One /api/tags call serves health + tags (skipped if fetched in the last 30s)
+            names = await fetch_tag_names(client, self.base_url)
+            if names is None:
+                raise RuntimeError(f"Ollama at {self.base_url} is not reachable.")
+
+            # Helpful warnings
+            for m in (self.chat_model, self.code_model):
+                if m not in names:
+                    print(f"[warn] Model '{m}' not in tags. Run 'ollama pull {m}'.")
+
+            # Warmups (non-fatal)
+            if self.eager_warmup:
+                # Concurrent since each model loads independently
+                await asyncio.gather(
+                    warmup_ollama_async(client, self.chat_model, self.keep_alive),
+                    warmup_ollama_async(client, self.code_model, self.keep_alive),
+                )
+            else:
+                # The agent and RAG engine both run on the code model and nothing calls chat_llm yet;
+                # loading the chat model too could evict the code model on a memory-limited host
+                await warmup_ollama_async(client, self.code_model, self.keep_alive)
+
+    def _cache_get(self, prompt: str) -> Optional[str]:
+        with self._text_cache_lock:
+            text = self._text_cache.get(prompt)
+            if text is not None:
+                self._text_cache.move_to_end(prompt)
+            return text
+
+    def _cache_put(self, prompt: str, text: str) -> None:
+        with self._text_cache_lock:
+            self._text_cache[prompt] = text
+            self._text_cache.move_to_end(prompt)
+            if len(self._text_cache) > QUERY_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        """Drop cached plain-text responses (e.g. after new files were uploaded)."""
+        with self._text_cache_lock:
+            self._text_cache.clear()
+
     def query_text(self, prompt: str) -> str:
-        """Plain agent query → returns text (no structuring)."""
-        res = self.agent.query(prompt)
-        return extract_text(res)
+        """Plain agent query → returns text (no structuring). Identical prompts are served from cache."""
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            return cached
+        text = extract_text(self.agent.query(prompt))
+        self._cache_put(prompt, text)
+        return text
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """Streaming agent chat → yields response tokens as they are generated (whole text on cache hit)."""
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            yield cached
+            return
+        buf = []
+        # Empty history resets ReAct memory per call, like agent.query does
+        for tok in self.agent.stream_chat(prompt, chat_history=[]).response_gen:
+            buf.append(tok)
+            yield tok
+        self._cache_put(prompt, "".join(buf))
 
     def generate_structured(self, prompt: str) -> CodeOutput:
         """
         Orchestrates: agent.query → structure to {code, description, filename}.
-        Has a fallback that extracts fenced code if JSON fails.
+        Uses the agent's fenced code block directly when present; otherwise runs the
+        JSON formatter, with a fenced-code fallback if JSON fails.
         """
+        user_prompt = prompt
+
         # Gentle nudge for echo tasks
         if "read" in prompt.lower() and ("content" in prompt.lower() or "contents" in prompt.lower() or "exact" in prompt.lower()):
             prompt += "\n\nReturn the code exactly as it is inside a single Python code block."
 
         agent_text = extract_text(self.agent.query(prompt))
 
+        # Fast path: a python/untagged fenced block is already there, so skip the JSON formatter LLM call
+        code_blk = fallback_extract_code(agent_text, PYTHON_FENCE_LANGS)
+        if code_blk:
+            return CodeOutput(
+                code=code_blk,
+                description=agent_text.split("```")[0].strip()[:500] or "Generated.",
+                filename=_slug(user_prompt),
+            )
+
         # JSON structuring
-        next_result = self.pipeline.run(response=agent_text)
-        structured_text = extract_text(next_result)
+        structured_text = self.code_llm.predict(self._json_prompt, response=agent_text)
 
         try:
             payload = robust_parse_to_dict(structured_text)
-            for k in ("code", "description", "filename"):
-                if k not in payload:
-                    raise KeyError(k)
+            if not payload.get("code"):
+                raise KeyError("code")
+            # Only code is required (a truncated reply may stop before the other fields)
+            payload = {
+                "code": payload["code"],
+                "description": payload.get("description") or "Generated.",
+                "filename": payload.get("filename") or "",
+            }
         except Exception:
-            # Fallback: extract from fenced code
-            code_blk = fallback_extract_code(agent_text)
+            # Fallback: extract fenced code from the formatter output (agent text had none)
+            code_blk = fallback_extract_code(structured_text, PYTHON_FENCE_LANGS)
             if not code_blk:
                 raise RuntimeError("Failed to parse structured output and no fenced code found.")
             payload = {
                 "code": code_blk,
                 "description": "Recovered from fenced code block (fallback).",
-                "filename": "generated_code.py",
+                "filename": "",
             }
 
+        payload["filename"] = _slug(str(payload.get("filename") or user_prompt))
         return CodeOutput(**payload)
@@ -14,7 +14,15 @@ OLLAMA_TIMEOUT = float(env("OLLAMA_TIMEOUT", "360"))
 OLLAMA_KEEP_ALIVE = env("OLLAMA_KEEP_ALIVE", "1h")
 OLLAMA_CHAT_MODEL = env("OLLAMA_CHAT_MODEL", "mistral:7b-instruct")
 OLLAMA_CODE_MODEL = env("OLLAMA_CODE_MODEL", "codellama:7b-instruct")
+# "1" warms chat + code models together at startup; otherwise only the code model (the one in use) is warmed
+OLLAMA_EAGER_WARMUP = env("OLLAMA_EAGER_WARMUP", "0") == "1"
+# Generation caps / context sizes per model (max new tokens, KV context length)
+OLLAMA_CHAT_NUM_PREDICT = int(env("OLLAMA_CHAT_NUM_PREDICT", "512"))
+OLLAMA_CHAT_NUM_CTX = int(env("OLLAMA_CHAT_NUM_CTX", "4096"))
+OLLAMA_CODE_NUM_PREDICT = int(env("OLLAMA_CODE_NUM_PREDICT", "1024"))
+OLLAMA_CODE_NUM_CTX = int(env("OLLAMA_CODE_NUM_CTX", "8192"))
 DATA_DIR = env("DATA_DIR", "./data")
+EMBED_BATCH_SIZE = int(env("EMBED_BATCH_SIZE", "64"))
 
 # Secret
 LLAMA_CLOUD_API_KEY = env("LLAMA_CLOUD_API_KEY")
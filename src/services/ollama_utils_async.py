@@ -0,0 +1,69 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from src.services.ollama_utils import cached_tag_names, store_tag_names, parse_tag_names
+
+T = TypeVar("T")
+
+def async_client(base_url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=8),
+        transport=httpx.AsyncHTTPTransport(retries=1),
+    )
+
+async def fetch_tag_names(client: httpx.AsyncClient, base_url: str) -> set[str] | None:
+    """
+    One /api/tags round-trip; doubles as the health check (None when unreachable).
+    Names are served from the 30s TTL cache in ollama_utils when present, so within that
+    window no request is made and reachability is not re-checked (warmups still report failures).
+    `base_url` is the cache key; pass the same string the client was built from.
+    """
+    names = cached_tag_names(base_url)
+    if names is not None:
+        return names
+    try:
+        r = await client.get("/api/tags")
+        r.raise_for_status()
+    except Exception as e:
+        print(f"[health] Ollama health check failed: {e}")
+        return None
+    try:
+        names = parse_tag_names(r.content)
+    except Exception as e:
+        print(f"[tags] Could not fetch tags: {e}")
+        return set()
+    store_tag_names(base_url, names)
+    return names
+
+async def warmup_ollama_async(client: httpx.AsyncClient, model: str, keep_alive: str,
+                              timeout: float = 90.0, retries: int = 2, backoff_sec: float = 5.0):
+    payload = {"model": model, "prompt": "ping", "stream": False, "keep_alive": keep_alive}
+    for attempt in range(1, retries + 1):
+        try:
+            r = await client.post("/api/generate", json=payload, timeout=timeout)
+            r.raise_for_status()
+            print(f"[warmup] {model} warmed successfully.")
+            return
+        except Exception as e:
+            print(f"[warmup] Warning: {model} attempt {attempt}/{retries} failed: {e}")
+            if attempt < retries:
+                await asyncio.sleep(backoff_sec * (2 ** (attempt - 1)))
+    print(f"[warmup] Giving up warming {model}. Proceeding anyway.")
+
+def run_sync(coro_factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run a coroutine to completion from sync code.
+    If an event loop is already running in this thread (e.g. Streamlit, Jupyter),
+    run it on a fresh loop in a worker thread instead of nesting.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro_factory())
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(lambda: asyncio.run(coro_factory())).result()
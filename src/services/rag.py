@@ -1,20 +1,153 @@
 import os
+import hashlib
+import functools
+import shutil
+from pathlib import Path
+import torch
 from llama_parse import LlamaParse
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index.core.embeddings import resolve_embed_model
+from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, load_index_from_storage
+from llama_index.core.readers.base import BaseReader
+from llama_index.core.query_engine import CustomQueryEngine
+from llama_index.core.schema import Document
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+INDEX_CACHE_DIR = os.path.join(".cache", "index")
+PARSED_CACHE_DIR = os.path.join(".cache", "parsed")
+EMBED_MODEL_NAME = "BAAI/bge-m3"
+NO_DOCS_RESPONSE = "No documents indexed."
+
+class CachedLlamaParse(BaseReader):
+    """
+    File extractor that serves LlamaParse markdown from disk when the file is unchanged.
+    Entries are keyed on (path, mtime, size), so editing or replacing a PDF re-parses it.
+    """
+
+    def __init__(self, parser: LlamaParse, cache_dir: str = PARSED_CACHE_DIR):
+        self.parser = parser
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, file) -> str:
+        st = os.stat(file)
+        key = hashlib.sha256(f"{os.path.abspath(file)}:{st.st_mtime}:{st.st_size}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.md")
+
+    def load_data(self, file, extra_info: dict | None = None, **kwargs) -> list[Document]:
+        cache_path = self._cache_path(file)
+        if os.path.isfile(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return [Document(text=f.read(), metadata=extra_info or {})]
+
+        docs = self.parser.load_data(file, extra_info=extra_info)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(d.text for d in docs))
+        os.replace(tmp_path, cache_path)
+        return docs
 
 def load_documents(data_dir: str, llama_cloud_api_key: str | None):
     if llama_cloud_api_key:
         parser = LlamaParse(result_type="markdown")
-        file_extractor = {".pdf": parser}
+        file_extractor = {".pdf": CachedLlamaParse(parser)}
         print("[data] Using LlamaParse for PDF parsing.")
-        return SimpleDirectoryReader(data_dir, file_extractor=file_extractor).load_data()
+        reader = SimpleDirectoryReader(data_dir, recursive=True, filename_as_id=True, file_extractor=file_extractor)
     else:
         print("[data] LLAMA_CLOUD_API_KEY not found. Using default reader fallback.")
-        return SimpleDirectoryReader(data_dir).load_data()
+        reader = SimpleDirectoryReader(data_dir, recursive=True, filename_as_id=True)
+
+    # Parallel loading uses a spawn-context Pool on every platform: each worker is a fresh interpreter
+    # that re-imports this module (torch, llama_parse, ...), so only fan out when there are enough
+    # files to pay for it. Callers need an `if __name__ == "__main__":` guard (main.py has one).
+    num_workers = min(8, os.cpu_count() or 1, len(reader.input_files))
+    if num_workers < 2:
+        return reader.load_data()
+    return reader.load_data(num_workers=num_workers)
+
+def _corpus_signature(data_dir: str, *extra: str) -> str:
+    """Short hash of every file's path, mtime and size (plus any extra settings) under data_dir."""
+    h = hashlib.sha256()
+    for p in sorted(Path(data_dir).rglob("*")):
+        if p.is_file():
+            st = p.stat()
+            h.update(f"{p}:{st.st_mtime}:{st.st_size}".encode())
+    for e in extra:
+        h.update(e.encode())
+    return h.hexdigest()[:16]
+
+def embed_device() -> str:
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+@functools.lru_cache(maxsize=4)
+def get_embed_model(name: str, device: str, batch: int) -> HuggingFaceEmbedding:
+    """Load the embedding model once per (name, device, batch) so agent rebuilds reuse it."""
+    return HuggingFaceEmbedding(model_name=name, device=device, embed_batch_size=batch, trust_remote_code=False)
 
-def build_query_engine(llm, data_dir: str, llama_cloud_api_key: str | None):
-    embed_model = resolve_embed_model("local:BAAI/bge-m3")
-    docs = load_documents(data_dir, llama_cloud_api_key)
-    index = VectorStoreIndex.from_documents(docs, embed_model=embed_model)
+class EmptyQueryEngine(CustomQueryEngine):
+    """Stand-in RAG engine for an empty data dir, so no embedder or index is built."""
+
+    def custom_query(self, query_str: str) -> str:
+        return NO_DOCS_RESPONSE
+
+def has_documents(data_dir: str) -> bool:
+    # Hidden files and anything under a hidden dir are skipped, matching SimpleDirectoryReader(exclude_hidden=True)
+    root = Path(data_dir)
+    return any(
+        p.is_file() and not any(part.startswith(".") for part in p.relative_to(root).parts)
+        for p in root.rglob("*")
+    )
+
+def _index_prefix(data_dir: str) -> str:
+    """Cache dir prefix scoped to one data dir, so several DATA_DIRs don't evict each other."""
+    dir_key = hashlib.sha256(os.path.abspath(data_dir).encode()).hexdigest()[:8]
+    return f"{INDEX_CACHE_DIR}-{dir_key}-"
+
+def _persist_index(index, persist_dir: str, prefix: str) -> None:
+    """
+    Persist via a temp dir + rename so a crash never leaves a half-written cache, then drop
+    this data dir's stale caches (other processes' in-progress temp dirs are left alone).
+    """
+    tmp_dir = f"{persist_dir}.part-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    index.storage_context.persist(persist_dir=tmp_dir)
+    try:
+        os.replace(tmp_dir, persist_dir)
+    except OSError:
+        # Another process persisted the same corpus first; keep theirs
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if not os.path.isdir(persist_dir):
+        print(f"[index] Warning: could not persist index to {persist_dir}.")
+        return
+    print(f"[index] Persisted index to {persist_dir}.")
+
+    parent, name = os.path.split(persist_dir)
+    entry_prefix = os.path.basename(prefix)
+    for entry in os.listdir(parent or "."):
+        if entry.startswith(entry_prefix) and entry != name and ".part-" not in entry:
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+def build_query_engine(llm, data_dir: str, llama_cloud_api_key: str | None, embed_batch_size: int = 64,
+                       embed_model: HuggingFaceEmbedding | None = None):
+    if not has_documents(data_dir):
+        print(f"[data] No files in {data_dir}. Skipping embedding and indexing.")
+        return EmptyQueryEngine()
+
+    if embed_model is None:
+        embed_model = get_embed_model(EMBED_MODEL_NAME, embed_device(), embed_batch_size)
+
+    # Reuse a persisted index when the corpus (and parser choice) is unchanged
+    sig = _corpus_signature(data_dir, EMBED_MODEL_NAME, "llamaparse" if llama_cloud_api_key else "default")
+    prefix = _index_prefix(data_dir)
+    persist_dir = f"{prefix}{sig}"
+    if os.path.isdir(persist_dir):
+        print(f"[index] Loading cached index from {persist_dir}.")
+        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+        index = load_index_from_storage(storage_context, embed_model=embed_model)
+    else:
+        docs = load_documents(data_dir, llama_cloud_api_key)
+        index = VectorStoreIndex.from_documents(docs, embed_model=embed_model, insert_batch_size=2048)
+        _persist_index(index, persist_dir, prefix)
     return index.as_query_engine(llm=llm)
@@ -2,16 +2,29 @@ import re
 from typing import Optional
 from pydantic import BaseModel
 from dirtyjson import loads as dirtyjson_loads
+try:
+    import orjson
+except ImportError:  # optional C-accelerated fast path
+    orjson = None
 from llama_index.core.output_parsers import PydanticOutputParser
 from llama_index.core.query_pipeline import QueryPipeline
 from llama_index.core.prompts import PromptTemplate
+from llama_index.core.base.response.schema import Response
+from llama_index.core.chat_engine.types import AgentChatResponse
+
+# Group 1: info-string language tag (None for a single-line fence); the rest of the opening line is dropped
+_CODE_FENCE_RE = re.compile(r"```(?:([\w+-]*)[^\n]*\n)?(.*?)```", re.DOTALL)
+PYTHON_FENCE_LANGS = frozenset({"", "python", "py", "python3"})
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?\s*(.*?)\s*(?:```)?$", re.DOTALL | re.IGNORECASE)
+_TEXT_ATTRS = ("text", "message", "response", "content")
+_RESPONSE_TYPES = (AgentChatResponse, Response)
 
 class CodeOutput(BaseModel):
     code: str
     description: str
     filename: str
 
-def build_output_pipeline(llm) -> QueryPipeline:
+def build_json_prompt() -> PromptTemplate:
     parser = PydanticOutputParser(CodeOutput)
     strict_prefix = (
         "You are a JSON-only formatter.\n"
@@ -21,23 +34,117 @@ def build_output_pipeline(llm) -> QueryPipeline:
     # code_parser_template import eden yer: src/prompts.py
     from src.prompts import code_parser_template  # absolute import (Streamlit için güvenli)
     json_prompt_str = strict_prefix + parser.format(code_parser_template)
-    json_prompt_tmpl = PromptTemplate(json_prompt_str)
-    return QueryPipeline(chain=[json_prompt_tmpl, llm])
+    return PromptTemplate(json_prompt_str)
+
+def build_output_pipeline(llm) -> QueryPipeline:
+    """Deprecated: AICodeAgent calls the LLM with build_json_prompt() directly."""
+    return QueryPipeline(chain=[build_json_prompt(), llm])
 
 def extract_text(result_obj) -> str:
-    for attr in ("text", "message", "response", "content"):
-        if hasattr(result_obj, attr) and getattr(result_obj, attr):
-            val = getattr(result_obj, attr)
-            if hasattr(val, "content") and isinstance(val.content, str):
-                return val.content
-            if isinstance(val, str):
-                return val
+    # Fast path for the response types the agent/pipeline actually return
+    if type(result_obj) in _RESPONSE_TYPES and isinstance(result_obj.response, str) and result_obj.response:
+        return result_obj.response
+    for attr in _TEXT_ATTRS:
+        val = getattr(result_obj, attr, None)
+        if not val:
+            continue
+        content = getattr(val, "content", None)
+        if isinstance(content, str):
+            return content
+        if isinstance(val, str):
+            return val
     return str(result_obj)
 
+def _complete_json(s: str) -> str:
+    """
+    Close whatever a truncated JSON document left open (string, objects, arrays)
+    so the prefix can still be parsed. An escape cut mid-way (including a partial
+    \\uXXXX or half a surrogate pair) is dropped. Complete documents are returned unchanged.
+    """
+    closers = []
+    in_str = esc = False
+    expect_key = key_open = False  # key_open: last string was an object key with no ':' yet
+    esc_start = 0  # index of the backslash opening the current/last escape
+    uni_left = 0  # hex digits still expected by a \uXXXX escape
+    high_start = high_end = -1  # span of a complete \uD800-\uDBFF escape (first half of a surrogate pair)
+    for i, ch in enumerate(s):
+        if in_str:
+            if uni_left:
+                uni_left -= 1
+                if not uni_left and s[esc_start + 2:i + 1].lower()[:2] in ("d8", "d9", "da", "db"):
+                    high_start, high_end = esc_start, i + 1
+            elif esc:
+                esc = False
+                if ch == "u":
+                    uni_left = 4
+            elif ch == "\\":
+                esc = True
+                esc_start = i
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+            key_open, expect_key = expect_key, False
+        elif ch == "{":
+            closers.append("}")
+            expect_key = True
+        elif ch == "[":
+            closers.append("]")
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+            expect_key = False
+        elif ch == ",":
+            expect_key = bool(closers) and closers[-1] == "}"
+        elif ch == ":":
+            key_open = False
+    if not closers and not in_str:
+        return s
+
+    out = s
+    if in_str:
+        cut = esc_start if esc or uni_left else len(s)
+        if high_end == cut:
+            cut = high_start  # a high surrogate whose pair was cut off
+        # Drops a dangling backslash, a partial \uXXXX and/or half a surrogate pair
+        out = out[:cut]
+        out += '"'
+    out = out.rstrip()
+    if out.endswith(","):
+        out = out[:-1].rstrip()
+    if out.endswith(":"):
+        out += " null"
+    elif key_open:
+        out += ": null"
+    return out + "".join(reversed(closers))
+
 def robust_parse_to_dict(text: str) -> dict:
     cleaned = text.replace("assistant:", "").strip()
-    return dirtyjson_loads(cleaned)
+    m = _JSON_FENCE_RE.match(cleaned)
+    if m:
+        cleaned = m.group(1)
+    completed = _complete_json(cleaned)
+    if orjson is not None:
+        for candidate in (cleaned, completed):
+            try:
+                return orjson.loads(candidate)
+            except orjson.JSONDecodeError:
+                pass
+    try:
+        return dirtyjson_loads(cleaned)
+    except Exception:
+        if completed == cleaned:
+            raise
+    # Truncated output (e.g. num_predict cut it off): parse the recovered prefix
+    return dirtyjson_loads(completed)
 
-def fallback_extract_code(agent_text: str) -> Optional[str]:
-    m = re.search(r"```(?:python)?\s*(.*?)```", agent_text, re.DOTALL | re.IGNORECASE)
-    return m.group(1).strip() if m else None
+def fallback_extract_code(agent_text: str, languages: Optional[frozenset] = None) -> Optional[str]:
+    """
+    Body of the first fenced code block, without its info string.
+    With `languages`, only blocks tagged with one of them (lowercase; "" = untagged) count.
+    """
+    for m in _CODE_FENCE_RE.finditer(agent_text):
+        if languages is None or (m.group(1) or "").lower() in languages:
+            return m.group(2).strip()
+    return None
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from src.services.structuring import (
+    PYTHON_FENCE_LANGS, CodeOutput, _complete_json, fallback_extract_code, robust_parse_to_dict
+)
+
+PAYLOAD = CodeOutput(
+    code='import requests\n\nresp = requests.post("http://localhost:5000/items", json={"name": "a\\tb"})\nprint(resp.status_code, "café ✓ 😀")\n',
+    description='Posts a new item to the "/items" endpoint [POST] and prints {status} — é.',
+    filename="post_item.py",
+).model_dump()
+FULL = json.dumps(PAYLOAD)  # ensure_ascii: non-ASCII becomes \uXXXX (and a surrogate pair for the emoji)
+CODE_START = FULL.index('"code": "') + len('"code": "')
+
+
+def test_complete_document_is_unchanged():
+    assert _complete_json(FULL) == FULL
+    assert robust_parse_to_dict(FULL) == PAYLOAD
+
+
+@pytest.mark.parametrize("cut", range(1, len(FULL) + 1))
+def test_every_truncation_parses(cut):
+    assert isinstance(json.loads(_complete_json(FULL[:cut])), dict)
+
+
+@pytest.mark.parametrize("cut", range(CODE_START, len(FULL) + 1))
+def test_truncation_recovers_code_prefix(cut):
+    parsed = robust_parse_to_dict(FULL[:cut])
+    assert PAYLOAD["code"].startswith(parsed["code"])
+
+
+@pytest.mark.parametrize("tail", ["\\", "\\u", "\\u00", "\\u00e", "\\ud83d", "\\ud83d\\u", "\\ud83d\\ude0"])
+def test_cut_inside_escape(tail):
+    assert robust_parse_to_dict('{"code": "x' + tail) == {"code": "x"}
+
+
+def test_dangling_key_and_colon():
+    assert json.loads(_complete_json('{"code": "x", "descr')) == {"code": "x", "descr": None}
+    assert json.loads(_complete_json('{"code": "x", "description":')) == {"code": "x", "description": None}
+    assert json.loads(_complete_json('{"code": "x",')) == {"code": "x"}
+
+
+def test_truncated_json_fence():
+    parsed = robust_parse_to_dict('assistant: ```json\n{"code": "print(1)", "descri')
+    assert parsed["code"] == "print(1)"
+
+
+@pytest.mark.parametrize(
+    "text, any_lang, python_only",
+    [
+        ("Here:\n```python\nprint(1)\n```", "print(1)", "print(1)"),
+        ("```py title=a.py\nprint(1)\n```", "print(1)", "print(1)"),
+        ("```\nprint(1)\n```", "print(1)", "print(1)"),
+        ("```print(1)```", "print(1)", "print(1)"),
+        ("```bash\nls -la\n```", "ls -la", None),
+        ('```json\n{"a": 1}\n```', '{"a": 1}', None),
+        ("```bash\nls\n```\nthen\n```python\nx = 1\n```", "ls", "x = 1"),
+        ("no code here", None, None),
+    ],
+)
+def test_fallback_extract_code(text, any_lang, python_only):
+    assert fallback_extract_code(text) == any_lang
+    assert fallback_extract_code(text, PYTHON_FENCE_LANGS) == python_only